@@ -11,8 +11,6 @@ RFC 2326
 # scapy.contrib.description = Real Time Streaming Protocol (RTSP)
 # scapy.contrib.status = loads
 
-import re
-
 from scapy.packet import (
     bind_bottom_up,
     bind_layers,
@@ -70,18 +68,15 @@ class RTSPRequest(_HTTPContent):
     )
 
     def do_dissect(self, s):
-        first_line, body = _dissect_headers(self, s)
+        first_line, head, body = _dissect_headers(self, s)
         try:
-            method, uri, version = re.split(rb"\s+", first_line, 2)
+            method, uri, version = first_line.split(None, 2)
             self.setfieldval("Method", method)
             self.setfieldval("Request_Uri", uri)
             self.setfieldval("Version", version)
         except ValueError:
             pass
-        if body:
-            self.raw_packet_cache = s[: -len(body)]
-        else:
-            self.raw_packet_cache = s
+        self.raw_packet_cache = head
         return body
 
     def mysummary(self):
@@ -114,18 +109,15 @@ class RTSPResponse(_HTTPContent):
         return RTSPRequest in other
 
     def do_dissect(self, s):
-        first_line, body = _dissect_headers(self, s)
+        first_line, head, body = _dissect_headers(self, s)
         try:
-            Version, Status, Reason = re.split(rb"\s+", first_line, 2)
+            Version, Status, Reason = first_line.split(None, 2)
             self.setfieldval("Version", Version)
             self.setfieldval("Status_Code", Status)
             self.setfieldval("Reason_Phrase", Reason)
         except ValueError:
             pass
-        if body:
-            self.raw_packet_cache = s[: -len(body)]
-        else:
-            self.raw_packet_cache = s
+        self.raw_packet_cache = head
         return body
 
     def mysummary(self):
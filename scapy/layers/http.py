@@ -40,12 +40,14 @@ You can turn auto-decompression/auto-compression off with::
 # Original Authors : Steeve Barbeau, Luca Invernizzi
 
 import gzip
-import io
 import os
 import re
 import socket
-import struct
 import subprocess
+import threading
+import zlib
+
+from functools import lru_cache
 
 from scapy.base_classes import Net
 from scapy.compat import plain_str, bytes_encode
@@ -78,6 +80,14 @@ try:
 except ImportError:
     _is_zstd_available = False
 
+try:
+    # python-isal provides faster drop-in replacements of zlib and gzip
+    from isal import igzip as _gzip
+    from isal import isal_zlib as _zlib
+except ImportError:
+    _gzip = gzip
+    _zlib = zlib
+
 if "http" not in conf.contribs:
     conf.contribs["http"] = {}
     conf.contribs["http"]["auto_compression"] = True
@@ -214,75 +224,229 @@ def _strip_header_name(name):
     return plain_str(name.strip()).replace("-", "_")
 
 
+# Lowercases an ASCII header name and replaces "-" with "_", so that it
+# can be matched against the (lowercased) field names
+_HEADER_LOWER_TABLE = bytes.maketrans(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZ-",
+    b"abcdefghijklmnopqrstuvwxyz_"
+)
+
+
 def _header_line(name, val):
     """Creates a HTTP header line"""
     # Python 3.4 doesn't support % on bytes
     return bytes_encode(name) + b": " + bytes_encode(val)
 
 
-def _parse_headers(s):
-    headers = s.split(b"\r\n")
-    headers_found = {}
-    for header_line in headers:
-        try:
-            key, value = header_line.split(b':', 1)
-        except ValueError:
-            continue
-        header_key = _strip_header_name(key).lower()
-        headers_found[header_key] = (key, value.strip())
-    return headers_found
+# Separator of the values of a header (e.g. "gzip, chunked")
+_COMMA_RE = re.compile(br"\s*,\s*")
+# Matches a "Name: value\r\n" header line. The last one may lack its CRLF.
+# Only CRLF ends a line: bare CR or LF are kept in the name or value.
+_HEADER_RE = re.compile(
+    br"(?:\A|(?<=\r\n))((?:[^:\r]|\r(?!\n))+):[ \t]*"
+    br"((?:[^\r]|\r(?!\n))*)(?:\r\n|\Z)"
+)
+
+
+def _split_encodings(*values):
+    """Returns the lowercased encodings listed in the values of the
+    Transfer-Encoding / Content-Encoding headers, as a tuple
+    """
+    encodings = ()
+    for value in values:
+        if value:
+            encodings += tuple(
+                _COMMA_RE.split(bytes_encode(value).strip().lower())
+            )
+    return encodings
+
+
+def _parse_headers(s, pos=0, endpos=None):
+    """Parses the headers found in s[pos:endpos], without copying them"""
+    if endpos is None:
+        endpos = len(s)
+    return {
+        key.strip().translate(_HEADER_LOWER_TABLE): (key, value.rstrip())
+        for key, value in _HEADER_RE.findall(s, pos, endpos)
+    }
+
+
+def _parse_fields_headers(s, pos, endpos, field_by_stripped):
+    """Parses the headers found in s[pos:endpos], and sorts them in a
+    single pass: returns a dictionary of the values of the known headers
+    (by field name, according to field_by_stripped), and a dictionary of
+    the unknown headers (by header name)
+    """
+    known = {}
+    unknown = {}
+    for key, value in _HEADER_RE.findall(s, pos, endpos):
+        # We want to still parse wrongly capitalized fields
+        field_name = field_by_stripped.get(
+            key.strip().translate(_HEADER_LOWER_TABLE)
+        )
+        # The leading whitespaces are skipped by the regex, and rstrip()
+        # doesn't copy values that have no trailing whitespace
+        if field_name is None:
+            unknown[key] = value.rstrip()
+        else:
+            known[field_name] = value.rstrip()
+    return known, unknown
 
 
-def _parse_headers_and_body(s):
-    ''' Takes a HTTP packet, and returns a tuple containing:
+def _find_head(s):
+    ''' Locates the head (first line and headers) of a HTTP packet, and
+    returns a tuple containing:
       _ the first line (e.g., "GET ...")
-      _ the headers in a dictionary
-      _ the body
+      _ the start and end offsets of the headers
+      _ the length of the head, or -1 if it isn't complete
     '''
     crlfcrlf = b"\r\n\r\n"
     crlfcrlfIndex = s.find(crlfcrlf)
     if crlfcrlfIndex != -1:
-        headers = s[:crlfcrlfIndex + len(crlfcrlf)]
-        body = s[crlfcrlfIndex + len(crlfcrlf):]
+        head_len = crlfcrlfIndex + len(crlfcrlf)
+        head_end = head_len
     else:
-        headers = s
-        body = b''
-    first_line, headers = headers.split(b"\r\n", 1)
-    return first_line.strip(), _parse_headers(headers), body
+        head_len = -1
+        head_end = len(s)
+    # The headers start right after the first line
+    crlfIndex = s.find(b"\r\n", 0, head_end)
+    if crlfIndex == -1:
+        return s[:head_end].strip(), head_end, head_end, head_len
+    return s[:crlfIndex].strip(), crlfIndex + 2, head_end, head_len
+
+
+def _parse_head(s):
+    ''' Parses the head (first line and headers) of a HTTP packet in place,
+    and returns a tuple containing:
+      _ the first line (e.g., "GET ...")
+      _ the headers in a dictionary
+      _ the length of the head, or -1 if it isn't complete
+    '''
+    first_line, pos, endpos, head_len = _find_head(s)
+    return first_line, _parse_headers(s, pos, endpos), head_len
+
+
+def _decompress_members(s, decompressobj):
+    """Decompresses s in a single pass, using the (zlib-like) decompression
+    objects returned by decompressobj(). Members/frames are decompressed one
+    after the other until only NUL padding is left, and an error is raised if
+    the data is truncated.
+    """
+    parts = []
+    while True:
+        dobj = decompressobj()
+        parts.append(dobj.decompress(s))
+        if not dobj.eof:
+            raise zlib.error("Incomplete or truncated stream")
+        s = dobj.unused_data.lstrip(b"\x00")
+        if not s:
+            break
+    return b"".join(parts)
+
+
+def _zlib_decompress(s, wbits):
+    """Decompresses a single zlib or raw deflate stream (depending on wbits),
+    ignoring any trailing data
+    """
+    dobj = _zlib.decompressobj(wbits)
+    s = dobj.decompress(s)
+    if not dobj.eof:
+        raise zlib.error("Incomplete or truncated stream")
+    return s
+
+
+_zstd_local = threading.local()
+
+
+def _zstd_context():
+    """Returns the zstandard compressor and decompressor of the current
+    thread. Those objects are reusable, but can't be shared across threads.
+    """
+    if not hasattr(_zstd_local, "decompressor"):
+        _zstd_local.decompressor = zstandard.ZstdDecompressor()
+        _zstd_local.compressor = zstandard.ZstdCompressor()
+    return _zstd_local
 
 
 def _dissect_headers(obj, s):
     """Takes a HTTP packet as the string s, and populates the scapy layer obj
     (either HTTPResponse or HTTPRequest). Returns the first line of the
-    HTTP packet, and the body
+    HTTP packet, its head (first line and headers, suitable as
+    raw_packet_cache) and the body
     """
-    first_line, headers, body = _parse_headers_and_body(s)
-    for f in obj.fields_desc:
-        # We want to still parse wrongly capitalized fields
-        stripped_name = _strip_header_name(f.name).lower()
-        try:
-            _, value = headers.pop(stripped_name)
-        except KeyError:
-            continue
-        obj.setfieldval(f.name, value)
-    if headers:
-        headers = dict(headers.values())
-        obj.setfieldval('Unknown_Headers', headers)
-    return first_line, body
+    first_line, pos, endpos, head_len = _find_head(s)
+    known_headers, unknown_headers = _parse_fields_headers(
+        s, pos, endpos, obj._field_by_stripped
+    )
+    # Like Packet.do_dissect, store the (already internal) values directly
+    obj.fields.update(known_headers)
+    if unknown_headers:
+        obj.fields['Unknown_Headers'] = unknown_headers
+    if head_len == -1:
+        head, body = s, b''
+    else:
+        head, body = s[:head_len], s[head_len:]
+    return first_line, head, body
 
 
 class _HTTPContent(Packet):
+    __slots__ = ["_encodings_cache"]
+    # Maps the lowercased stripped name of a header to its field name.
+    # Built once per subclass, see __init_subclass__
+    _field_by_stripped = {}
+    _build_fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super(_HTTPContent, cls).__init_subclass__(**kwargs)
+        cls._field_by_stripped = {
+            bytes_encode(f.name).translate(_HEADER_LOWER_TABLE): f.name
+            for f in cls.fields_desc
+            if f.name != "Unknown_Headers"
+        }
+        # (field name, prefix, separator) of each field, in build order.
+        # Fields used in the first line have a space as a separator,
+        # whereas headers are prefixed by their name and terminated by a
+        # new line
+        cls._build_fields = tuple(
+            (
+                f.name,
+                bytes_encode(f.real_name) + b": " if i >= 3 else b"",
+                b" " if i <= 1 else b"\r\n",
+            )
+            for i, f in enumerate(cls.fields_desc)
+            if f.name != "Unknown_Headers"
+        )
+
+    def __init__(self, *args, **kwargs):
+        self._encodings_cache = None
+        super(_HTTPContent, self).__init__(*args, **kwargs)
+        if "Transfer_Encoding" in kwargs or "Content_Encoding" in kwargs:
+            # The fields may have been overwritten after the dissection
+            self._encodings_cache = None
+
+    # The encodings cache is reset when the encoding headers are set through
+    # setfieldval/delfieldval. Writing them directly in self.fields (after
+    # _get_encodings() was called) leaves it stale.
+    def setfieldval(self, attr, val):
+        if attr in ("Transfer_Encoding", "Content_Encoding"):
+            self._encodings_cache = None
+        super(_HTTPContent, self).setfieldval(attr, val)
+
+    def delfieldval(self, attr):
+        if attr in ("Transfer_Encoding", "Content_Encoding"):
+            self._encodings_cache = None
+        super(_HTTPContent, self).delfieldval(attr)
+
     # https://developer.mozilla.org/fr/docs/Web/HTTP/Headers/Transfer-Encoding
     def _get_encodings(self):
-        encodings = []
-        if isinstance(self, HTTPResponse):
-            if self.Transfer_Encoding:
-                encodings += [plain_str(x).strip().lower() for x in
-                              plain_str(self.Transfer_Encoding).split(",")]
-            if self.Content_Encoding:
-                encodings += [plain_str(x).strip().lower() for x in
-                              plain_str(self.Content_Encoding).split(",")]
-        return encodings
+        if not isinstance(self, HTTPResponse):
+            # Only responses have encoding headers
+            return ()
+        if self._encodings_cache is None:
+            self._encodings_cache = _split_encodings(
+                self.Transfer_Encoding, self.Content_Encoding
+            )
+        return self._encodings_cache
 
     def hashret(self):
         return b"HTTP1"
@@ -292,32 +456,55 @@ class _HTTPContent(Packet):
             return s
         encodings = self._get_encodings()
         # Un-chunkify
-        if "chunked" in encodings:
-            data = b""
-            while s:
-                length, _, body = s.partition(b"\r\n")
+        if b"chunked" in encodings:
+            # Walk the chunks in place, and only join them once at the end
+            mv = memoryview(s)
+            chunks = []
+            pos = 0
+            while pos < len(s):
+                crlf = s.find(b"\r\n", pos)
+                if crlf == -1:
+                    # Not a valid chunk. Ignore
+                    break
                 try:
-                    length = int(length, 16)
+                    length = int(s[pos:crlf], 16)
                 except ValueError:
+                    # Chunk extensions ("size;name=value") are ignored
+                    semi = s.find(b";", pos, crlf)
+                    if semi == -1:
+                        # Not a valid chunk. Ignore
+                        break
+                    try:
+                        length = int(s[pos:semi], 16)
+                    except ValueError:
+                        # Not a valid chunk. Ignore
+                        break
+                if length < 0:
                     # Not a valid chunk. Ignore
                     break
-                else:
-                    load = body[:length]
-                    if body[length:length + 2] != b"\r\n":
-                        # Invalid chunk. Ignore
-                        break
-                    s = body[length + 2:]
-                    data += load
-            if not s:
-                s = data
+                start = crlf + 2
+                end = start + length
+                if s[end:end + 2] != b"\r\n":
+                    # Invalid chunk. Ignore
+                    break
+                chunks.append(mv[start:end])
+                pos = end + 2
+            if pos == len(s):
+                s = b"".join(chunks)
         # Decompress
         try:
-            if "deflate" in encodings:
-                import zlib
-                s = zlib.decompress(s)
-            elif "gzip" in encodings:
-                s = gzip.decompress(s)
-            elif "compress" in encodings:
+            if b"deflate" in encodings:
+                try:
+                    s = _zlib_decompress(s, zlib.MAX_WBITS)
+                except (zlib.error, _zlib.error):
+                    # Some servers send raw deflate data, without the
+                    # zlib wrapper
+                    s = _zlib_decompress(s, -zlib.MAX_WBITS)
+            elif b"gzip" in encodings:
+                s = _decompress_members(
+                    s, lambda: _zlib.decompressobj(16 + zlib.MAX_WBITS)
+                )
+            elif b"compress" in encodings:
                 if _is_lzw_available:
                     s = lzw.decompress(s)
                 else:
@@ -325,7 +512,7 @@ class _HTTPContent(Packet):
                         "Can't import lzw. compress decompression "
                         "will be ignored !"
                     )
-            elif "br" in encodings:
+            elif b"br" in encodings:
                 if _is_brotli_available:
                     s = brotli.decompress(s)
                 else:
@@ -333,14 +520,14 @@ class _HTTPContent(Packet):
                         "Can't import brotli. brotli decompression "
                         "will be ignored !"
                     )
-            elif "zstd" in encodings:
+            elif b"zstd" in encodings:
                 if _is_zstd_available:
                     # Using its streaming API since its simple API could handle
                     # only cases where there is content size data embedded in
                     # the frame
-                    bio = io.BytesIO(s)
-                    reader = zstandard.ZstdDecompressor().stream_reader(bio)
-                    s = reader.read()
+                    s = _decompress_members(
+                        s, _zstd_context().decompressor.decompressobj
+                    )
                 else:
                     log_loading.info(
                         "Can't import zstandard. zstd decompression "
@@ -356,12 +543,11 @@ class _HTTPContent(Packet):
             return pkt + pay
         encodings = self._get_encodings()
         # Compress
-        if "deflate" in encodings:
-            import zlib
-            pay = zlib.compress(pay)
-        elif "gzip" in encodings:
-            pay = gzip.compress(pay)
-        elif "compress" in encodings:
+        if b"deflate" in encodings:
+            pay = _zlib.compress(pay)
+        elif b"gzip" in encodings:
+            pay = _gzip.compress(pay)
+        elif b"compress" in encodings:
             if _is_lzw_available:
                 pay = lzw.compress(pay)
             else:
@@ -369,7 +555,7 @@ class _HTTPContent(Packet):
                     "Can't import lzw. compress compression "
                     "will be ignored !"
                 )
-        elif "br" in encodings:
+        elif b"br" in encodings:
             if _is_brotli_available:
                 pay = brotli.compress(pay)
             else:
@@ -377,9 +563,9 @@ class _HTTPContent(Packet):
                     "Can't import brotli. brotli compression will "
                     "be ignored !"
                 )
-        elif "zstd" in encodings:
+        elif b"zstd" in encodings:
             if _is_zstd_available:
-                pay = zstandard.ZstdCompressor().compress(pay)
+                pay = _zstd_context().compressor.compress(pay)
             else:
                 log_loading.info(
                     "Can't import zstandard. zstd compression will "
@@ -397,40 +583,29 @@ class _HTTPContent(Packet):
         # Check for cache
         if self.raw_packet_cache is not None:
             return self.raw_packet_cache
-        p = b""
+        # The chunks are joined once at the end
+        chunks = []
         # Walk all the fields, in order
-        for i, f in enumerate(self.fields_desc):
-            if f.name == "Unknown_Headers":
-                continue
+        for name, prefix, separator in self._build_fields:
             # Get the field value
-            val = self.getfieldval(f.name)
+            val = self.getfieldval(name)
             if not val:
                 # Not specified. Skip
                 continue
-
-            if i >= 3:
-                val = _header_line(f.real_name, val)
-            # Fields used in the first line have a space as a separator,
-            # whereas headers are terminated by a new line
-            if i <= 1:
-                separator = b' '
-            else:
-                separator = b'\r\n'
             # Add the field into the packet
-            p = f.addfield(self, p, val + separator)
+            chunks.append(prefix)
+            chunks.append(bytes_encode(val))
+            chunks.append(separator)
         # Handle Unknown_Headers
         if self.Unknown_Headers:
-            headers_text = b""
             for name, value in self.Unknown_Headers.items():
-                headers_text += _header_line(name, value) + b"\r\n"
-            p = self.get_field("Unknown_Headers").addfield(
-                self, p, headers_text
-            )
+                chunks.append(_header_line(name, value))
+                chunks.append(b"\r\n")
         # The packet might be empty, and in that case it should stay empty.
-        if p:
+        if chunks:
             # Add an additional line after the last header
-            p = f.addfield(self, p, b'\r\n')
-        return p
+            chunks.append(b"\r\n")
+        return b"".join(chunks)
 
     def guess_payload_class(self, payload):
         """Detect potential payloads
@@ -489,18 +664,15 @@ class HTTPRequest(_HTTPContent):
 
     def do_dissect(self, s):
         """From the HTTP packet string, populate the scapy object"""
-        first_line, body = _dissect_headers(self, s)
+        first_line, head, body = _dissect_headers(self, s)
         try:
-            Method, Path, HTTPVersion = re.split(br"\s+", first_line, 2)
+            Method, Path, HTTPVersion = first_line.split(None, 2)
             self.setfieldval('Method', Method)
             self.setfieldval('Path', Path)
             self.setfieldval('Http_Version', HTTPVersion)
         except ValueError:
             pass
-        if body:
-            self.raw_packet_cache = s[:-len(body)]
-        else:
-            self.raw_packet_cache = s
+        self.raw_packet_cache = head
         return body
 
     def mysummary(self):
@@ -534,18 +706,15 @@ class HTTPResponse(_HTTPContent):
 
     def do_dissect(self, s):
         ''' From the HTTP packet string, populate the scapy object '''
-        first_line, body = _dissect_headers(self, s)
+        first_line, head, body = _dissect_headers(self, s)
         try:
-            HTTPVersion, Status, Reason = re.split(br"\s+", first_line, 2)
+            HTTPVersion, Status, Reason = first_line.split(None, 2)
             self.setfieldval('Http_Version', HTTPVersion)
             self.setfieldval('Status_Code', Status)
             self.setfieldval('Reason_Phrase', Reason)
         except ValueError:
             pass
-        if body:
-            self.raw_packet_cache = s[:-len(body)]
-        else:
-            self.raw_packet_cache = s
+        self.raw_packet_cache = head
         return body
 
     def mysummary(self):
@@ -557,6 +726,29 @@ class HTTPResponse(_HTTPContent):
 # General HTTP class + defragmentation
 
 
+def _status_code(first_line):
+    """Returns the status code of a response's first line, if valid"""
+    try:
+        _, status, _ = first_line.split(None, 2)
+    except ValueError:
+        return None
+    return status
+
+
+@lru_cache(maxsize=None)
+def _first_line_regex(reqmethods, hdr):
+    """Returns a compiled regex matching the first line of either a request
+    (in the "req" group) or a response, for the given methods and protocol
+    name. Both are tried in a single scan.
+    """
+    return re.compile(
+        br"(?:(?P<req>(?:" + reqmethods + br") " +
+        br"(?:.+?) " +
+        hdr + br"/\d\.\d)" +
+        br"|" + hdr + br"/\d\.\d \d\d\d .*)$"
+    )
+
+
 class HTTP(Packet):
     name = "HTTP 1"
     fields_desc = []
@@ -585,15 +777,14 @@ class HTTP(Packet):
                 if len(_pkt) < 9:
                     # Invalid total length
                     return cls
-                if ord(_pkt[3:4]) not in _HTTP2_types:
+                if _pkt[3] not in _HTTP2_types:
                     # Invalid type
                     return cls
-                length = struct.unpack("!I", b"\0" + _pkt[:3])[0] + 9
+                length = int.from_bytes(_pkt[:3], "big") + 9
                 if length > len(_pkt):
                     # Invalid length
                     return cls
-                sid = struct.unpack("!I", _pkt[5:9])[0]
-                if sid >> 31 != 0:
+                if _pkt[5] & 0x80:
                     # Invalid Reserved bit
                     return cls
                 _pkt = _pkt[length:]
@@ -609,13 +800,24 @@ class HTTP(Packet):
         # https://datatracker.ietf.org/doc/html/rfc2616#section-4.4
         if not detect_end or is_unknown:
             metadata["detect_unknown"] = False
-            http_packet = cls(data)
-            # Detect packing method
-            if not isinstance(http_packet.payload, _HTTPContent):
-                return http_packet
-            is_response = isinstance(http_packet.payload, cls.clsresp)
+            # Detect packing method. The packet is only dissected once it
+            # is complete: until then, only its head is parsed.
+            content_cls = None
+            if cls.dispatch_hook(data) is cls:
+                content_cls = cls._guess_content_class(data)
+            if not issubclass(content_cls or Raw, _HTTPContent):
+                return cls(data)
+            is_response = issubclass(content_cls, cls.clsresp)
+            # The head can't change once complete: only parse it once
+            probe = metadata.get("http_head")
+            if probe is None:
+                probe = _parse_head(data)
+                if probe[2] != -1:
+                    metadata["http_head"] = probe
+            first_line, headers, head_len = probe
+            body_len = len(data) - head_len if head_len != -1 else 0
             # Packets may have a Content-Length we must honnor
-            length = http_packet.Content_Length
+            length = headers.get(b"content_length", (None, None))[1]
             # Heuristic to try and detect instant HEAD responses, as those include a
             # Content-Length that must not be honored.
             if is_response and data.endswith(b"\r\n\r\n"):
@@ -626,8 +828,8 @@ class HTTP(Packet):
                 # we have the packet
                 length = int(length)
                 # Subtract the length of the "HTTP*" layer
-                if http_packet.payload.payload or length == 0:
-                    http_length = len(data) - len(http_packet.payload.payload)
+                if body_len or length == 0:
+                    http_length = len(data) - body_len
                     detect_end = lambda dat: len(dat) - http_length >= length
                 else:
                     # The HTTP layer isn't fully received.
@@ -635,19 +837,23 @@ class HTTP(Packet):
                     metadata["detect_unknown"] = True
             else:
                 # It's not Content-Length based. It could be chunked
-                encodings = http_packet[cls].payload._get_encodings()
-                chunked = ("chunked" in encodings)
+                chunked = False
+                if issubclass(content_cls, HTTPResponse):
+                    chunked = b"chunked" in _split_encodings(
+                        headers.get(b"transfer_encoding", (None, None))[1],
+                        headers.get(b"content_encoding", (None, None))[1],
+                    )
                 if chunked:
                     detect_end = lambda dat: dat.endswith(b"0\r\n\r\n")
                 # HTTP Requests that do not have any content,
                 # end with a double CRLF. Same for HEAD responses
-                elif isinstance(http_packet.payload, cls.clsreq):
+                elif issubclass(content_cls, cls.clsreq):
                     detect_end = lambda dat: dat.endswith(b"\r\n\r\n")
                     # In case we are handling a HTTP Request,
                     # we want to continue assessing the data,
                     # to handle requests with a body (POST)
                     metadata["detect_unknown"] = True
-                elif is_response and http_packet.Status_Code == b"101":
+                elif is_response and _status_code(first_line) == b"101":
                     # If it's an upgrade response, it may also hold a
                     # different protocol data.
                     # make sure all headers are present
@@ -660,36 +866,34 @@ class HTTP(Packet):
                     metadata["detect_unknown"] = True
             metadata["detect_end"] = detect_end
             if detect_end(data):
-                return http_packet
+                return cls(data)
         else:
             if detect_end(data):
                 http_packet = cls(data)
                 return http_packet
 
-    def guess_payload_class(self, payload):
+    @classmethod
+    def _guess_content_class(cls, payload):
         """Decides if the payload is an HTTP Request or Response, or
         something else.
         """
-        try:
-            prog = re.compile(
-                br"^(?:" + self.reqmethods + br") " +
-                br"(?:.+?) " +
-                self.hdr + br"/\d\.\d$"
-            )
-            crlfIndex = payload.index(b"\r\n")
-            req = payload[:crlfIndex]
-            result = prog.match(req)
-            if result:
-                return self.clsreq
-            else:
-                prog = re.compile(b"^" + self.hdr + br"/\d\.\d \d\d\d .*$")
-                result = prog.match(req)
-                if result:
-                    return self.clsresp
-        except ValueError:
+        crlfIndex = payload.find(b"\r\n")
+        if crlfIndex == -1:
             # Anything that isn't HTTP but on port 80
-            pass
-        return Raw
+            return Raw
+        prog = _first_line_regex(cls.reqmethods, cls.hdr)
+        result = prog.match(payload, 0, crlfIndex)
+        if result is None:
+            return Raw
+        if result.group("req") is not None:
+            return cls.clsreq
+        return cls.clsresp
+
+    def guess_payload_class(self, payload):
+        """Decides if the payload is an HTTP Request or Response, or
+        something else.
+        """
+        return self._guess_content_class(payload)
 
 
 def http_request(host, path="/", port=80, timeout=3,